@@ -25,6 +25,33 @@ AES_TAG_SIZE = 128  # bits (16 octets)
 # Mode de chiffrement
 CIPHER_MODE = "GCM"  # Galois/Counter Mode (authentification incluse)
 
+# Chiffrement parallèle des réponses (0 = chiffrement en série sur le thread de relais)
+CRYPTO_WORKERS = 0
+CRYPTO_REORDER_WINDOW = 8          # Enregistrements en cours au maximum (ordre préservé)
+RESPONSE_RECORD_SIZE = 64 * 1024   # Taille maximale d'un enregistrement chiffré de réponse
+
+# --- Connexion aux serveurs web (Proxy de Sortie) ---
+
+ORIGIN_REQUEST_DEADLINE = 15       # Budget total (résolution + connexion + 1er octet), secondes
+ORIGIN_CONNECT_STAGGER = 0.25      # Délai entre deux tentatives parallèles (RFC 8305)
+ORIGIN_FAILED_ADDRESS_TTL = 60     # Durée pendant laquelle une adresse en échec est reléguée
+
+# Attente du premier enregistrement côté Proxy Source : couvre l'échéance du Proxy de Sortie
+SOURCE_FIRST_RECORD_TIMEOUT = ORIGIN_REQUEST_DEADLINE + 5
+
+# --- Configuration du Préchargement (Proxy de Sortie) ---
+
+# Active le préchargement des ressources (CSS, JS, images) des pages HTML
+PREFETCH_ENABLED = False
+PREFETCH_MAX_DEPTH = 1               # 1 = ressources de la page, 2 = + url() des CSS
+PREFETCH_MAX_RESOURCES_PER_PAGE = 20
+PREFETCH_MAX_CONCURRENCY = 4         # Téléchargements simultanés
+PREFETCH_MAX_RESOURCE_BYTES = 512 * 1024
+PREFETCH_MAX_CACHE_BYTES = 16 * 1024 * 1024
+PREFETCH_MAX_SCAN_BYTES = 256 * 1024  # Octets HTML analysés par réponse
+PREFETCH_CACHE_TTL = 30              # secondes
+PREFETCH_FETCH_TIMEOUT = 5           # secondes
+
 # --- Configuration de Débogage ---
 DEBUG = True
 LOG_TRAFFIC = False  # Active les logs détaillés du trafic (attention : données sensibles)
\ No newline at end of file
@@ -0,0 +1,168 @@
+import errno
+import os
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from web_security_proxy.config.settings import (
+    ORIGIN_REQUEST_DEADLINE, ORIGIN_CONNECT_STAGGER, ORIGIN_FAILED_ADDRESS_TTL
+)
+
+# Adresses récemment en échec (sockaddr -> instant d'expiration), partagées entre les sessions
+FAILED_ADDRESSES = {}
+FAILED_ADDRESSES_LOCK = threading.Lock()
+
+CONNECT_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+# getaddrinfo est bloquant : il est exécuté sur ce pool pour rester dans l'échéance
+RESOLVER_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="resolver")
+
+
+def mark_address_failed(sockaddr):
+    """Relègue une adresse en fin de liste pendant ORIGIN_FAILED_ADDRESS_TTL secondes."""
+    now = time.monotonic()
+    with FAILED_ADDRESSES_LOCK:
+        for expired in [addr for addr, expires_at in FAILED_ADDRESSES.items() if expires_at <= now]:
+            del FAILED_ADDRESSES[expired]
+        FAILED_ADDRESSES[sockaddr] = now + ORIGIN_FAILED_ADDRESS_TTL
+
+
+def forget_address_failure(sockaddr):
+    with FAILED_ADDRESSES_LOCK:
+        FAILED_ADDRESSES.pop(sockaddr, None)
+
+
+def is_address_failed(sockaddr):
+    with FAILED_ADDRESSES_LOCK:
+        expires_at = FAILED_ADDRESSES.get(sockaddr)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del FAILED_ADDRESSES[sockaddr]
+            return False
+        return True
+
+
+def resolve_addresses(host, port, deadline=None):
+    """Résout toutes les adresses de l'hôte et les ordonne pour les tentatives de connexion.
+
+    Les familles sont alternées en commençant par la première renvoyée par le résolveur
+    (RFC 8305, section 4), puis les adresses récemment en échec sont placées en dernier.
+    Lève socket.timeout si la résolution n'aboutit pas avant l'échéance.
+    """
+    future = RESOLVER_POOL.submit(socket.getaddrinfo, host, port, type=socket.SOCK_STREAM)
+    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+    try:
+        infos = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise socket.timeout(f"Échéance dépassée lors de la résolution de {host}")
+
+    by_family = {}
+    seen = set()
+    for family, _, _, _, sockaddr in infos:
+        if sockaddr in seen:
+            continue
+        seen.add(sockaddr)
+        by_family.setdefault(family, []).append((family, sockaddr))
+
+    interleaved = []
+    queues = list(by_family.values())
+    while queues:
+        for queue in queues:
+            interleaved.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+
+    # Classement sur un instantané unique : une entrée qui expire en cours de route ne fait
+    # pas disparaître l'adresse des deux listes
+    now = time.monotonic()
+    with FAILED_ADDRESSES_LOCK:
+        failed_snapshot = {addr for addr, expires_at in FAILED_ADDRESSES.items() if expires_at > now}
+    healthy = [addr for addr in interleaved if addr[1] not in failed_snapshot]
+    failed = [addr for addr in interleaved if addr[1] in failed_snapshot]
+    return healthy + failed
+
+
+def connect_to_origin(host, port, deadline=None):
+    """Ouvre une connexion TCP vers le serveur web en mode « happy eyeballs ».
+
+    Les tentatives sont lancées en parallèle, décalées de ORIGIN_CONNECT_STAGGER secondes
+    (ou immédiatement après un échec) ; la première connexion établie est retournée en mode
+    bloquant et les autres sont fermées. Lève socket.timeout si l'échéance est dépassée.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + ORIGIN_REQUEST_DEADLINE
+
+    addresses = resolve_addresses(host, port, deadline)
+    if not addresses:
+        raise socket.error(f"Aucune adresse trouvée pour {host}:{port}")
+
+    selector = selectors.DefaultSelector()
+    pending = {}
+    last_error = None
+    next_index = 0
+    next_start = time.monotonic()
+
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                for sockaddr in pending.values():
+                    mark_address_failed(sockaddr)
+                raise socket.timeout(f"Échéance dépassée lors de la connexion à {host}:{port}")
+
+            # Lancement de la tentative suivante
+            if next_index < len(addresses) and (now >= next_start or not pending):
+                family, sockaddr = addresses[next_index]
+                next_index += 1
+                sock = None
+                try:
+                    # Échoue par exemple avec EAFNOSUPPORT pour une adresse IPv6 sur un hôte sans IPv6
+                    sock = socket.socket(family, socket.SOCK_STREAM)
+                    sock.setblocking(False)
+                    err = sock.connect_ex(sockaddr)
+                    if err not in CONNECT_IN_PROGRESS:
+                        raise socket.error(err, os.strerror(err))
+                except socket.error as e:
+                    if sock:
+                        sock.close()
+                    mark_address_failed(sockaddr)
+                    last_error = e
+                    next_start = now
+                    continue
+                selector.register(sock, selectors.EVENT_WRITE, sockaddr)
+                pending[sock] = sockaddr
+                next_start = now + ORIGIN_CONNECT_STAGGER
+                continue
+
+            if not pending:
+                break
+
+            timeout = deadline - now
+            if next_index < len(addresses):
+                timeout = min(timeout, next_start - now)
+
+            for key, _ in selector.select(max(timeout, 0)):
+                sock = key.fileobj
+                sockaddr = key.data
+                selector.unregister(sock)
+                del pending[sock]
+
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err == 0:
+                    forget_address_failure(sockaddr)
+                    sock.setblocking(True)
+                    return sock
+
+                sock.close()
+                mark_address_failed(sockaddr)
+                last_error = socket.error(err, os.strerror(err))
+                next_start = time.monotonic()
+    finally:
+        for sock in pending:
+            sock.close()
+        selector.close()
+
+    raise last_error or socket.error(f"Connexion impossible à {host}:{port}")
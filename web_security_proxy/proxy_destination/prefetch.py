@@ -0,0 +1,360 @@
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+from web_security_proxy.config.settings import (
+    BUFFER_SIZE,
+    PREFETCH_MAX_DEPTH, PREFETCH_MAX_RESOURCES_PER_PAGE, PREFETCH_MAX_CONCURRENCY,
+    PREFETCH_MAX_RESOURCE_BYTES, PREFETCH_MAX_CACHE_BYTES, PREFETCH_MAX_SCAN_BYTES,
+    PREFETCH_CACHE_TTL, PREFETCH_FETCH_TIMEOUT
+)
+from .origin_connector import connect_to_origin
+
+# Balises HTML qui référencent une sous-ressource (feuille de style, script, image)
+TAG_PATTERN = re.compile(rb"<(link|script|img)\b[^>]*>", re.IGNORECASE)
+ATTR_PATTERN = re.compile(rb"""\b(rel|href|src)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+CSS_URL_PATTERN = re.compile(rb"""url\(\s*['"]?([^'")\s]+)['"]?\s*\)""", re.IGNORECASE)
+
+# Longueur maximale conservée entre deux chunks pour une balise coupée en deux
+MAX_TAG_CARRY = 2048
+
+# En-têtes de la requête d'origine recopiés dans les requêtes de préchargement
+FORWARDED_HEADERS = ("user-agent", "accept-language")
+
+
+def parse_headers(raw_headers):
+    """Retourne la ligne de statut/requête et un dictionnaire des en-têtes (noms en minuscules)."""
+    lines = raw_headers.decode('latin-1', errors='ignore').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+def normalize_path(request_path):
+    """Ramène une cible absolue (http://hote/chemin) à son chemin + query."""
+    if request_path.startswith('http://') or request_path.startswith('https://'):
+        parsed = urlparse(request_path)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        return path
+    return request_path or '/'
+
+
+def is_prefetchable_request(request_data):
+    """Indique si une requête peut être servie depuis le cache de préchargement.
+
+    Seuls les GET sans cookie ni authentification sont éligibles : les ressources
+    préchargées sont récupérées sans identifiants et ne doivent pas leur être substituées.
+    """
+    header_end = request_data.find(b'\r\n\r\n')
+    if header_end == -1:
+        return False
+    request_line, headers = parse_headers(request_data[:header_end])
+    if not request_line.startswith('GET '):
+        return False
+    return 'cookie' not in headers and 'authorization' not in headers
+
+
+def is_cacheable_response(headers):
+    """Indique si une réponse préchargée peut être rejouée à un autre client.
+
+    Le cache est partagé entre toutes les sessions du Proxy de Sortie : les réponses
+    marquées no-store ou private, celles qui posent un cookie (Set-Cookie) et celles qui
+    varient selon un en-tête autre qu'Accept-Encoding (la requête de préchargement impose
+    identity) ne sont pas conservées.
+    """
+    if 'set-cookie' in headers:
+        return False
+    directives = [d.strip().split('=', 1)[0] for d in headers.get('cache-control', '').lower().split(',')]
+    if 'no-store' in directives or 'private' in directives:
+        return False
+    vary = [v.strip() for v in headers.get('vary', '').lower().split(',') if v.strip()]
+    return all(v == 'accept-encoding' for v in vary)
+
+
+class PrefetchCache:
+    """Cache court terme (TTL) des réponses préchargées, consommées une seule fois.
+
+    `lock` protège à la fois les entrées et `stats` ; PrefetchEngine y passe son propre
+    verrou (réentrant) pour que toutes les métriques soient mises à jour sous le même verrou.
+    """
+
+    def __init__(self, max_bytes, ttl, stats, lock=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = stats
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = lock or threading.RLock()
+
+    def _discard(self, key):
+        """Retire une entrée jamais servie et la comptabilise comme gaspillée (verrou tenu)."""
+        data, _ = self.entries.pop(key)
+        self.total_bytes -= len(data)
+        self.stats['wasted'] += 1
+        self.stats['wasted_bytes'] += len(data)
+
+    def _purge_expired(self, now):
+        for key in [k for k, (_, expires_at) in self.entries.items() if expires_at <= now]:
+            self._discard(key)
+
+    def contains(self, key):
+        with self.lock:
+            self._purge_expired(time.monotonic())
+            return key in self.entries
+
+    def put(self, key, data):
+        """Stocke une réponse ; évince les plus anciennes si le budget d'octets est dépassé."""
+        if len(data) > self.max_bytes:
+            return False
+        with self.lock:
+            self._purge_expired(time.monotonic())
+            if key in self.entries:
+                self._discard(key)
+            while self.entries and self.total_bytes + len(data) > self.max_bytes:
+                self._discard(next(iter(self.entries)))
+            self.entries[key] = (data, time.monotonic() + self.ttl)
+            self.total_bytes += len(data)
+        return True
+
+    def take(self, key):
+        """Retourne et retire la réponse associée à la clé, ou None si absente/expirée."""
+        with self.lock:
+            self._purge_expired(time.monotonic())
+            if key not in self.entries:
+                return None
+            data, _ = self.entries.pop(key)
+            self.total_bytes -= len(data)
+            self.stats['hits'] += 1
+            self.stats['hit_bytes'] += len(data)
+            return data
+
+
+class HtmlScanner:
+    """Analyse une réponse HTML au fil des chunks et signale les sous-ressources même origine."""
+
+    def __init__(self, engine, host, port, path, forwarded_headers):
+        self.engine = engine
+        self.base_url = f"http://{host}:{port}{path}"
+        self.forwarded_headers = forwarded_headers
+        self.header_data = b""
+        self.in_body = False
+        self.active = True
+        self.carry = b""
+        self.scanned_bytes = 0
+        self.seen = set()
+
+    def feed(self, chunk):
+        """Reçoit un chunk brut de la réponse du serveur web."""
+        if not self.active:
+            return
+
+        if not self.in_body:
+            self.header_data += chunk
+            header_end = self.header_data.find(b'\r\n\r\n')
+            if header_end == -1:
+                if len(self.header_data) > PREFETCH_MAX_SCAN_BYTES:
+                    self.active = False
+                return
+            status_line, headers = parse_headers(self.header_data[:header_end])
+            status_parts = status_line.split()
+            content_type = headers.get('content-type', '').lower()
+            content_encoding = headers.get('content-encoding', 'identity').lower()
+            if (len(status_parts) < 2 or status_parts[1] != '200'
+                    or 'text/html' not in content_type
+                    or content_encoding != 'identity'):
+                self.active = False
+                return
+            self.in_body = True
+            self.engine.count('pages_scanned')
+            chunk = self.header_data[header_end + 4:]
+            self.header_data = b""
+
+        remaining = PREFETCH_MAX_SCAN_BYTES - self.scanned_bytes
+        chunk = chunk[:remaining]
+        self.scanned_bytes += len(chunk)
+
+        data = self.carry + chunk
+        for match in TAG_PATTERN.finditer(data):
+            url = self._resource_url(match.group(1).lower(), match.group(0))
+            if url:
+                self._schedule(url)
+        self.carry = data[data.rfind(b'>') + 1:][-MAX_TAG_CARRY:]
+
+        if self.scanned_bytes >= PREFETCH_MAX_SCAN_BYTES:
+            self.active = False
+
+    def _resource_url(self, tag, tag_data):
+        attrs = {}
+        for match in ATTR_PATTERN.finditer(tag_data):
+            value = match.group(2) or match.group(3) or match.group(4) or b""
+            attrs[match.group(1).lower()] = value.decode('utf-8', errors='ignore').strip()
+
+        if tag == b'link':
+            if 'stylesheet' not in attrs.get(b'rel', '').lower().split():
+                return None
+            return attrs.get(b'href')
+        return attrs.get(b'src')
+
+    def _schedule(self, url):
+        if len(self.seen) >= PREFETCH_MAX_RESOURCES_PER_PAGE or url in self.seen:
+            return
+        self.seen.add(url)
+        self.engine.schedule(self.base_url, url, 1, self.forwarded_headers)
+
+
+class PrefetchEngine:
+    """Précharge en parallèle les sous-ressources des pages HTML relayées par le Proxy de Sortie."""
+
+    def __init__(self):
+        # misses : ressource demandée alors que son préchargement était encore en cours
+        self.stats = {
+            'pages_scanned': 0, 'scheduled': 0, 'prefetched': 0, 'prefetched_bytes': 0,
+            'failed': 0, 'hits': 0, 'hit_bytes': 0, 'misses': 0,
+            'wasted': 0, 'wasted_bytes': 0,
+        }
+        self.lock = threading.RLock()
+        self.cache = PrefetchCache(PREFETCH_MAX_CACHE_BYTES, PREFETCH_CACHE_TTL, self.stats, self.lock)
+        self.executor = ThreadPoolExecutor(
+            max_workers=PREFETCH_MAX_CONCURRENCY,
+            thread_name_prefix="prefetch"
+        )
+        self.inflight = set()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def scanner_for(self, host, port, request_path, request_data):
+        """Retourne un HtmlScanner pour la réponse à cette requête, ou None si non éligible."""
+        if not is_prefetchable_request(request_data):
+            return None
+        _, headers = parse_headers(request_data[:request_data.find(b'\r\n\r\n')])
+        forwarded = {name: headers[name] for name in FORWARDED_HEADERS if name in headers}
+        return HtmlScanner(self, host, port, normalize_path(request_path), forwarded)
+
+    def lookup(self, host, port, request_path):
+        """Retourne la réponse préchargée correspondant à la requête, ou None."""
+        key = (host.lower(), port, normalize_path(request_path))
+        with self.lock:
+            data = self.cache.take(key)
+            if data is None and key in self.inflight:
+                self.stats['misses'] += 1
+            return data
+
+    def schedule(self, base_url, url, depth, forwarded_headers):
+        """Planifie le préchargement d'une URL si elle est de même origine que base_url."""
+        if depth > PREFETCH_MAX_DEPTH:
+            return
+        resolved = urlparse(urljoin(base_url, url))
+        base = urlparse(base_url)
+        if resolved.scheme != 'http' or resolved.hostname != base.hostname:
+            return
+        if (resolved.port or 80) != (base.port or 80):
+            return
+
+        path = resolved.path or '/'
+        if resolved.query:
+            path += '?' + resolved.query
+        key = (resolved.hostname.lower(), resolved.port or 80, path)
+
+        with self.lock:
+            if key in self.inflight or self.cache.contains(key):
+                return
+            self.inflight.add(key)
+            self.stats['scheduled'] += 1
+        self.executor.submit(self._fetch, key, depth, forwarded_headers)
+
+    def _fetch(self, key, depth, forwarded_headers):
+        host, port, path = key
+        try:
+            response = fetch_resource(host, port, path, forwarded_headers)
+            if response is None:
+                self.count('failed')
+                return
+            if self.cache.put(key, response):
+                self.count('prefetched')
+                self.count('prefetched_bytes', len(response))
+                self._scan_stylesheet(key, response, depth, forwarded_headers)
+        except (socket.error, ValueError) as e:
+            self.count('failed')
+            print(f"[!] Préchargement échoué pour {host}:{port}{path} : {e}")
+        finally:
+            with self.lock:
+                self.inflight.discard(key)
+
+    def _scan_stylesheet(self, key, response, depth, forwarded_headers):
+        """Planifie les url() d'une feuille de style préchargée (niveau de profondeur suivant)."""
+        if depth >= PREFETCH_MAX_DEPTH:
+            return
+        header_end = response.find(b'\r\n\r\n')
+        _, headers = parse_headers(response[:header_end])
+        if 'text/css' not in headers.get('content-type', '').lower():
+            return
+        host, port, path = key
+        base_url = f"http://{host}:{port}{path}"
+        seen = set()
+        for match in CSS_URL_PATTERN.finditer(response[header_end + 4:]):
+            url = match.group(1).decode('utf-8', errors='ignore')
+            if url.startswith('data:') or url in seen:
+                continue
+            if len(seen) >= PREFETCH_MAX_RESOURCES_PER_PAGE:
+                break
+            seen.add(url)
+            self.schedule(base_url, url, depth + 1, forwarded_headers)
+
+    def format_stats(self):
+        """Résumé lisible des métriques de préchargement (succès / gaspillage)."""
+        with self.lock:
+            s = dict(self.stats)
+        return (f"{s['hits']} succès ({s['hit_bytes']} octets), "
+                f"{s['misses']} trop tardives, "
+                f"{s['prefetched']} préchargées, {s['wasted']} gaspillées "
+                f"({s['wasted_bytes']} octets), {s['failed']} échecs")
+
+
+def fetch_resource(host, port, path, forwarded_headers):
+    """Télécharge une ressource auprès du serveur web et retourne la réponse HTTP brute.
+
+    Retourne None si le statut n'est pas 200, si la réponse dépasse PREFETCH_MAX_RESOURCE_BYTES
+    ou si elle ne peut pas être partagée (voir is_cacheable_response).
+    """
+    host_header = host if port == 80 else f"{host}:{port}"
+    request = f"GET {path} HTTP/1.1\r\nHost: {host_header}\r\n"
+    for name, value in forwarded_headers.items():
+        request += f"{name}: {value}\r\n"
+    request += "Accept: */*\r\nAccept-Encoding: identity\r\nConnection: close\r\n\r\n"
+
+    target_socket = connect_to_origin(host, port, time.monotonic() + PREFETCH_FETCH_TIMEOUT)
+    try:
+        target_socket.settimeout(PREFETCH_FETCH_TIMEOUT)
+        target_socket.sendall(request.encode('latin-1'))
+        response = b""
+        while True:
+            chunk = target_socket.recv(BUFFER_SIZE)
+            if not chunk:
+                break
+            response += chunk
+            if len(response) > PREFETCH_MAX_RESOURCE_BYTES:
+                return None
+    finally:
+        target_socket.close()
+
+    header_end = response.find(b'\r\n\r\n')
+    if header_end == -1:
+        return None
+    status_line, headers = parse_headers(response[:header_end])
+    status_parts = status_line.split()
+    if len(status_parts) < 2 or status_parts[1] != '200':
+        return None
+    if not is_cacheable_response(headers):
+        return None
+    return response
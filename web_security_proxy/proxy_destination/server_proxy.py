@@ -2,11 +2,20 @@
 import socket
 import threading
 import sys
+import time
 from urllib.parse import urlparse
 from cryptography import exceptions as crypto_exceptions
 
-from web_security_proxy.config.settings import DESTINATION_PROXY_HOST, DESTINATION_PROXY_PORT, BUFFER_SIZE
+from web_security_proxy.config.settings import (
+    DESTINATION_PROXY_HOST, DESTINATION_PROXY_PORT, BUFFER_SIZE,
+    PREFETCH_ENABLED, ORIGIN_REQUEST_DEADLINE, RESPONSE_RECORD_SIZE
+)
+from web_security_proxy.record_channel import OrderedCryptoPipeline, send_record, recv_record
 from .crypto_server import generate_rsa_keys, decrypt_session_key, encrypt_data, decrypt_data
+from .prefetch import PrefetchEngine, is_prefetchable_request
+from .origin_connector import connect_to_origin
+
+PREFETCH_ENGINE = None
 
 def handle_proxy_client(client_socket):
     """Gère la connexion du Proxy Source."""
@@ -37,12 +46,21 @@ def handle_proxy_client(client_socket):
         end_idx = encrypted_key_data.find(b":END_KEY")
         encrypted_session_key = encrypted_key_data[start_idx:end_idx]
         
+        # Octets déjà reçus après le marqueur : fin de ligne puis début de la requête chiffrée
+        pending = encrypted_key_data[end_idx + len(b":END_KEY"):]
+        while len(pending) < 2:
+            chunk = client_socket.recv(BUFFER_SIZE)
+            if not chunk:
+                raise Exception("Connexion fermée avant la réception de la requête.")
+            pending += chunk
+        pending = pending[2:]
+        
         session_key = decrypt_session_key(encrypted_session_key)
         print("[*] Clé de session déchiffrée et établie.")
         
 
             
-        encrypted_request = client_socket.recv(BUFFER_SIZE)
+        encrypted_request = recv_record(client_socket, pending)
         if not encrypted_request:
             return
         
@@ -58,40 +76,69 @@ def handle_proxy_client(client_socket):
         # 6. Extraction de l'URL cible depuis la requête HTTP
         target_host, target_port, request_path = parse_http_request(decrypted_request)
         
-        # 7. Connexion au serveur web cible
-        target_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        target_socket.settimeout(15)  # Timeout de 15 secondes
-        target_socket.connect((target_host, target_port))
-        print(f"[*] Connecté au serveur web : {target_host}:{target_port}")
-        
-        # 8. Envoi de la requête au serveur web
+        # Ressource déjà préchargée : réponse servie sans aller-retour vers le serveur web
+        if PREFETCH_ENGINE and is_prefetchable_request(decrypted_request):
+            cached_response = PREFETCH_ENGINE.lookup(target_host, target_port, request_path)
+            if cached_response:
+                encryptor = OrderedCryptoPipeline(encrypt_data, session_key, lambda record: send_record(client_socket, record))
+                try:
+                    for offset in range(0, len(cached_response), RESPONSE_RECORD_SIZE):
+                        encryptor.submit(cached_response[offset:offset + RESPONSE_RECORD_SIZE])
+                    encryptor.flush()
+                finally:
+                    encryptor.close()
+                print(f"[*] Réponse servie depuis le cache de préchargement ({PREFETCH_ENGINE.format_stats()}).")
+                return
+        
+        # 7. Connexion au serveur web cible (toutes adresses en parallèle, échéance globale)
+        deadline = time.monotonic() + ORIGIN_REQUEST_DEADLINE
+        target_socket = connect_to_origin(target_host, target_port, deadline)
+        print(f"[*] Connecté au serveur web : {target_host}:{target_port} ({target_socket.getpeername()[0]})")
+        
+        # 8. Envoi de la requête au serveur web (dans le budget restant)
+        target_socket.settimeout(max(deadline - time.monotonic(), 0.001))
         target_socket.sendall(decrypted_request)
         
         # 9. Relais de la réponse (Réception, CHIFFREMENT, Renvoi au Proxy Source)
-        # CORRECTION: Amélioration de la lecture complète de la réponse
-        target_socket.settimeout(2)  # 2 secondes entre chaque chunk
+        # Le premier octet est attendu jusqu'à l'échéance, puis 2 secondes entre chaque chunk
+        target_socket.settimeout(max(deadline - time.monotonic(), 0.001))
+        
+        scanner = None
+        if PREFETCH_ENGINE:
+            scanner = PREFETCH_ENGINE.scanner_for(target_host, target_port, request_path, decrypted_request)
+        
+        # Les enregistrements sont chiffrés en parallèle si CRYPTO_WORKERS > 0 (ordre préservé)
+        encryptor = OrderedCryptoPipeline(encrypt_data, session_key, lambda record: send_record(client_socket, record))
         
         total_bytes = 0
-        while True:
-            try:
-                response_chunk = target_socket.recv(BUFFER_SIZE)
-                if not response_chunk:
+        try:
+            while True:
+                try:
+                    response_chunk = target_socket.recv(RESPONSE_RECORD_SIZE)
+                    if not response_chunk:
+                        break
+                    
+                    if total_bytes == 0:
+                        target_socket.settimeout(2)
+                    total_bytes += len(response_chunk)
+                    
+                    # Repérage des sous-ressources à précharger (pages HTML uniquement)
+                    if scanner:
+                        scanner.feed(response_chunk)
+                    
+                    # CHIFFREMENT de la réponse et envoi au Proxy Source
+                    encryptor.submit(response_chunk)
+                    
+                except socket.timeout:
+                    # Fin normale de la transmission
                     break
-                
-                total_bytes += len(response_chunk)
-                
-                # CHIFFREMENT de la réponse
-                encrypted_response = encrypt_data(response_chunk, session_key)
-                
-                # Envoi au Proxy Source
-                client_socket.sendall(encrypted_response)
-                
-            except socket.timeout:
-                # Fin normale de la transmission
-                break
-            except socket.error as e:
-                print(f"[!] Erreur lors du relais : {e}")
-                break
+                except socket.error as e:
+                    print(f"[!] Erreur lors du relais : {e}")
+                    break
+            
+            encryptor.flush()
+        finally:
+            encryptor.close()
         
         if target_socket:
             target_socket.close()
@@ -155,9 +202,15 @@ def parse_http_request(request_data):
 def start_proxy():
     """Point d'entrée du Proxy de Sortie."""
     
+    global PREFETCH_ENGINE
+    
     # Générer les clés RSA au démarrage
     generate_rsa_keys()
     
+    if PREFETCH_ENABLED:
+        PREFETCH_ENGINE = PrefetchEngine()
+        print("[*] Préchargement des sous-ressources activé.")
+    
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     
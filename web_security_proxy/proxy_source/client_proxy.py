@@ -6,8 +6,9 @@ from cryptography import exceptions as crypto_exceptions
 from web_security_proxy.config.settings import (
     SOURCE_PROXY_HOST, SOURCE_PROXY_PORT, 
     DESTINATION_PROXY_HOST, DESTINATION_PROXY_PORT, 
-    BUFFER_SIZE
+    BUFFER_SIZE, SOURCE_FIRST_RECORD_TIMEOUT
 )
+from web_security_proxy.record_channel import OrderedCryptoPipeline, send_record, recv_record
 from .crypto_client import (
     load_public_key, 
     generate_and_encrypt_session_key, 
@@ -69,27 +70,32 @@ def handle_browser_connection(browser_socket):
             return
 
         encrypted_request = encrypt_data(raw_http_request, session_key) 
-        target_socket.sendall(encrypted_request)
+        send_record(target_socket, encrypted_request)
 
-        target_socket.settimeout(5)
+        # Le premier enregistrement peut arriver jusqu'à l'échéance du Proxy de Sortie
+        # (résolution DNS + connexion + premier octet), les suivants en moins de 5 secondes
+        target_socket.settimeout(SOURCE_FIRST_RECORD_TIMEOUT)
         
-        while True:
-            try:
-                encrypted_response_chunk = target_socket.recv(BUFFER_SIZE)
-                if not encrypted_response_chunk:
-                    break
-                
+        # Les enregistrements sont déchiffrés en parallèle si CRYPTO_WORKERS > 0 (ordre préservé)
+        decryptor = OrderedCryptoPipeline(decrypt_data, session_key, browser_socket.sendall)
+        try:
+            while True:
                 try:
-                    decrypted_response = decrypt_data(encrypted_response_chunk, session_key)
-                    browser_socket.sendall(decrypted_response)
-                except crypto_exceptions.InvalidTag:
-                    print("Erreur: donnees corrompues detectees")
+                    encrypted_record = recv_record(target_socket)
+                    if encrypted_record is None:
+                        break
+                    target_socket.settimeout(5)
+                    decryptor.submit(encrypted_record)
+                except socket.timeout:
                     break
-                    
-            except socket.timeout:
-                break
-            except socket.error:
-                break
+                except socket.error:
+                    break
+            
+            decryptor.flush()
+        except crypto_exceptions.InvalidTag:
+            print("Erreur: donnees corrompues detectees")
+        finally:
+            decryptor.close()
             
     except crypto_exceptions.InvalidTag:
         print("Erreur: verification de l'integrite des donnees echouee")
@@ -0,0 +1,123 @@
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from web_security_proxy.config.settings import CRYPTO_WORKERS, CRYPTO_REORDER_WINDOW
+
+# Taille maximale acceptée pour un enregistrement chiffré reçu (protège contre une longueur aberrante)
+MAX_RECORD_SIZE = 1024 * 1024
+
+RECORD_HEADER = struct.Struct('!I')
+
+CRYPTO_POOL = None
+CRYPTO_POOL_LOCK = threading.Lock()
+
+
+def send_record(sock, encrypted_record):
+    """Envoie un enregistrement chiffré précédé de sa longueur (4 octets, big-endian)."""
+    sock.sendall(RECORD_HEADER.pack(len(encrypted_record)) + encrypted_record)
+
+
+def recv_exact(sock, size, pending=b""):
+    """Lit exactement `size` octets en consommant d'abord `pending`.
+
+    Retourne (données, reste de `pending`), ou (None, b"") si la connexion est fermée avant.
+    """
+    data = bytearray(pending[:size])
+    pending = pending[size:]
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None, b""
+        data += chunk
+    return bytes(data), pending
+
+
+def recv_record(sock, pending=b""):
+    """Lit un enregistrement chiffré précédé de sa longueur ; retourne None en fin de flux.
+
+    `pending` contient d'éventuels octets déjà lus sur la socket (fin de la poignée de main).
+    """
+    header, pending = recv_exact(sock, RECORD_HEADER.size, pending)
+    if header is None:
+        return None
+    record_size = RECORD_HEADER.unpack(header)[0]
+    if record_size > MAX_RECORD_SIZE:
+        raise ValueError(f"Enregistrement chiffré trop grand ({record_size} octets).")
+    record, _ = recv_exact(sock, record_size, pending)
+    return record
+
+
+def get_crypto_pool():
+    """Retourne le pool de threads de chiffrement partagé par les deux proxies (créé au premier appel)."""
+    global CRYPTO_POOL
+    with CRYPTO_POOL_LOCK:
+        if CRYPTO_POOL is None:
+            CRYPTO_POOL = ThreadPoolExecutor(max_workers=CRYPTO_WORKERS, thread_name_prefix="crypto")
+        return CRYPTO_POOL
+
+
+class OrderedCryptoPipeline:
+    """Applique `crypto_function(record, session_key)` en parallèle et restitue les résultats dans l'ordre.
+
+    Chaque enregistrement est transmis dès que lui et tous ceux qui le précèdent sont
+    traités, éventuellement depuis un thread du pool. Au plus `window` enregistrements
+    sont en cours ; au-delà, submit() attend que le plus ancien soit transmis. Avec
+    workers=0 le traitement se fait sur le thread appelant.
+    """
+
+    def __init__(self, crypto_function, session_key, output, workers=None, window=None):
+        self.crypto_function = crypto_function
+        self.session_key = session_key
+        self.output = output
+        self.workers = CRYPTO_WORKERS if workers is None else workers
+        self.window = max(1, CRYPTO_REORDER_WINDOW if window is None else window)
+        self.pool = None
+        if self.workers > 0:
+            self.pool = get_crypto_pool() if workers is None else ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.error = None
+
+    def submit(self, record):
+        if self.pool is None:
+            self.output(self.crypto_function(record, self.session_key))
+            return
+        with self.condition:
+            while len(self.pending) >= self.window and self.error is None:
+                self.condition.wait()
+            if self.error is not None:
+                raise self.error
+            future = self.pool.submit(self.crypto_function, record, self.session_key)
+            self.pending.append(future)
+        future.add_done_callback(self._send_ready)
+
+    def _send_ready(self, _future=None):
+        """Transmet, dans l'ordre, les enregistrements traités en tête de file."""
+        with self.condition:
+            try:
+                while self.pending and self.pending[0].done() and self.error is None:
+                    self.output(self.pending.popleft().result())
+            except Exception as e:
+                # Relevée par le prochain submit() ou flush() sur le thread appelant
+                self.error = e
+            self.condition.notify_all()
+
+    def flush(self):
+        """Attend que tous les enregistrements en cours soient transmis, dans l'ordre de soumission."""
+        with self.condition:
+            while self.pending and self.error is None:
+                self.condition.wait()
+            if self.error is not None:
+                raise self.error
+
+    def close(self):
+        """Abandonne les enregistrements non transmis et libère un pool dédié."""
+        with self.condition:
+            abandoned = list(self.pending)
+            self.pending.clear()
+        for future in abandoned:
+            future.cancel()
+        if self.pool is not None and self.pool is not CRYPTO_POOL:
+            self.pool.shutdown(wait=False)
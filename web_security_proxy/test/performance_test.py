@@ -0,0 +1,88 @@
+"""
+Benchmark du chiffrement parallèle des réponses
+Mesure le débit AES-256-GCM (chiffrement côté Proxy de Sortie, déchiffrement côté
+Proxy Source) sur des réponses de plusieurs mégaoctets selon le nombre de workers
+"""
+
+import argparse
+import os
+import time
+
+from web_security_proxy.config.settings import CRYPTO_REORDER_WINDOW, RESPONSE_RECORD_SIZE
+from web_security_proxy.record_channel import OrderedCryptoPipeline
+from web_security_proxy.proxy_destination.crypto_server import encrypt_data
+from web_security_proxy.proxy_source.crypto_client import decrypt_data
+
+
+def split_records(payload, record_size):
+    """Découpe une réponse en enregistrements comme le fait le relais du Proxy de Sortie."""
+    return [payload[offset:offset + record_size] for offset in range(0, len(payload), record_size)]
+
+
+def measure_pipeline(crypto_function, records, session_key, workers, window):
+    """Traite tous les enregistrements ; retourne (durée en secondes, sortie ordonnée)."""
+    output = []
+    pipeline = OrderedCryptoPipeline(crypto_function, session_key, output.append, workers=workers, window=window)
+    try:
+        start = time.perf_counter()
+        for record in records:
+            pipeline.submit(record)
+        pipeline.flush()
+        duration = time.perf_counter() - start
+    finally:
+        pipeline.close()
+    return duration, output
+
+
+def run_benchmark(size_mb, record_size, window, max_workers, iterations):
+    """Compare le débit en série (0 worker) et avec 1..max_workers workers."""
+    print("\n" + "="*60)
+    print(" BENCHMARK DU CHIFFREMENT PARALLÈLE")
+    print("="*60)
+    print(f"  Réponse : {size_mb} Mo, enregistrements de {record_size // 1024} Ko, fenêtre {window}")
+    print(f"  Coeurs disponibles : {os.cpu_count()}")
+
+    session_key = os.urandom(32)
+    payload = os.urandom(size_mb * 1024 * 1024)
+    records = split_records(payload, record_size)
+
+    results = []
+    for workers in range(0, max_workers + 1):
+        encrypt_times = []
+        decrypt_times = []
+        for _ in range(iterations):
+            encrypt_time, encrypted = measure_pipeline(encrypt_data, records, session_key, workers, window)
+            decrypt_time, decrypted = measure_pipeline(decrypt_data, encrypted, session_key, workers, window)
+            if b"".join(decrypted) != payload:
+                raise RuntimeError(f"Sortie désordonnée ou corrompue avec {workers} workers.")
+            encrypt_times.append(encrypt_time)
+            decrypt_times.append(decrypt_time)
+
+        encrypt_throughput = size_mb / min(encrypt_times)
+        decrypt_throughput = size_mb / min(decrypt_times)
+        results.append((workers, encrypt_throughput, decrypt_throughput))
+
+    serial_encrypt, serial_decrypt = results[0][1], results[0][2]
+    print(f"\n  {'Workers':>8} | {'Chiffrement':>14} | {'Déchiffrement':>14} | {'Gain':>7} | {'Gain/coeur':>10}")
+    print(f"  {'-'*8}-+-{'-'*14}-+-{'-'*14}-+-{'-'*7}-+-{'-'*10}")
+    speedups = [(enc / serial_encrypt + dec / serial_decrypt) / 2 for _, enc, dec in results]
+    for (workers, encrypt_throughput, decrypt_throughput), speedup in zip(results, speedups):
+        label = "série" if workers == 0 else str(workers)
+        per_core = f"{(speedup - speedups[1]) / (workers - 1) * 100:+.0f}%" if workers > 1 else "-"
+        print(f"  {label:>8} | {encrypt_throughput:9.1f} MB/s | {decrypt_throughput:9.1f} MB/s | "
+              f"{speedup:6.2f}x | {per_core:>10}")
+
+    print("\n  Gain/coeur : accélération ajoutée par worker supplémentaire au-delà du premier.")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du chiffrement parallèle des réponses")
+    parser.add_argument('--size-mb', type=int, default=32, help="Taille de la réponse simulée (Mo)")
+    parser.add_argument('--record-kb', type=int, default=RESPONSE_RECORD_SIZE // 1024, help="Taille d'un enregistrement (Ko)")
+    parser.add_argument('--window', type=int, default=CRYPTO_REORDER_WINDOW, help="Fenêtre de réordonnancement")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help="Nombre maximal de workers")
+    parser.add_argument('--iterations', type=int, default=3, help="Répétitions par configuration (meilleur temps retenu)")
+    args = parser.parse_args()
+
+    run_benchmark(args.size_mb, args.record_kb * 1024, args.window, args.max_workers, args.iterations)
@@ -0,0 +1,336 @@
+"""
+Test d'endurance (soak) des deux proxies
+Charge constante pendant plusieurs heures contre un serveur web local,
+avec suivi de la mémoire (tracemalloc, RSS), des threads et des descripteurs de fichiers
+"""
+
+import argparse
+import gc
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+
+import psutil
+import requests
+
+from web_security_proxy.config.settings import (
+    SOURCE_PROXY_HOST, SOURCE_PROXY_PORT, DESTINATION_PROXY_PORT,
+    ORIGIN_REQUEST_DEADLINE, SOURCE_FIRST_RECORD_TIMEOUT
+)
+from web_security_proxy.proxy_destination import server_proxy
+from web_security_proxy.proxy_source import client_proxy
+
+PROXY = {
+    'http': f'http://{SOURCE_PROXY_HOST}:{SOURCE_PROXY_PORT}',
+}
+
+# Seuils de croissance tolérés par rapport à la mesure de référence (après l'échauffement)
+MAX_THREAD_GROWTH = 50
+MAX_FD_GROWTH = 100
+MAX_RSS_GROWTH_MB = 64
+MAX_TRACED_GROWTH_MB = 32
+
+# Proportion maximale de requêtes en échec (hors route bloquée, dont l'échec est attendu)
+MAX_ERROR_RATE = 0.01
+
+WARMUP_SECONDS = 60
+
+# Réponses du serveur web local : une page HTML (avec sous-ressources pour le préchargement),
+# des blocs binaires de tailles variées dont un de plusieurs centaines de Ko
+ORIGIN_PAGES = {
+    '/': (b'text/html', b'<html><head><title>soak</title><link rel="stylesheet" href="/style.css">'
+                        b'</head><body><img src="small.bin">' + b'x' * 1500 + b'</body></html>'),
+    '/style.css': (b'text/css', b'body { margin: 0; }'),
+    '/small.bin': (b'application/octet-stream', os.urandom(512)),
+    '/medium.bin': (b'application/octet-stream', os.urandom(3000)),
+    '/large.bin': (b'application/octet-stream', os.urandom(400 * 1024)),
+    '/keepalive.bin': (b'application/octet-stream', os.urandom(2000)),
+    '/stalled': (b'text/plain', b'trop tard'),
+}
+
+# Connexion laissée ouverte après la réponse : le relais du Proxy de Sortie se termine
+# sur son timeout de 2 secondes au lieu de la fin de flux
+KEEP_ALIVE_PATHS = {'/keepalive.bin'}
+
+# Premier octet envoyé après STALL_SECONDS : le Proxy de Sortie abandonne à son échéance
+# ORIGIN_REQUEST_DEADLINE et ferme le tunnel avant le timeout du Proxy Source
+STALLED_PATHS = {'/stalled'}
+STALL_SECONDS = ORIGIN_REQUEST_DEADLINE + 1
+
+
+def report(message=""):
+    """Affiche sur la sortie réelle (la sortie standard des proxies est redirigée)."""
+    print(message, file=sys.__stdout__, flush=True)
+
+
+class OriginHandler(socketserver.StreamRequestHandler):
+    """Serveur web minimal : répond en une seule écriture puis ferme la connexion.
+
+    Les routes de KEEP_ALIVE_PATHS gardent la connexion ouverte jusqu'à sa fermeture par le
+    proxy ; celles de STALLED_PATHS attendent STALL_SECONDS avant de répondre.
+    """
+
+    def handle(self):
+        request = b""
+        while b'\r\n\r\n' not in request:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return
+            request += chunk
+
+        target = request.split(b'\r\n', 1)[0].split()[1].decode('latin-1')
+        if target.startswith('http://'):
+            target = '/' + target.split('/', 3)[3] if target.count('/') >= 3 else '/'
+
+        if target in ORIGIN_PAGES:
+            content_type, body = ORIGIN_PAGES[target]
+            status = b"200 OK"
+        else:
+            content_type, body = b'text/plain', b'not found'
+            status = b"404 Not Found"
+
+        keep_alive = target in KEEP_ALIVE_PATHS
+        if target in STALLED_PATHS:
+            time.sleep(STALL_SECONDS)
+
+        try:
+            self.request.sendall(
+                b"HTTP/1.1 " + status + b"\r\n"
+                b"Content-Type: " + content_type + b"\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                b"Connection: " + (b"keep-alive" if keep_alive else b"close") + b"\r\n\r\n" + body
+            )
+            if keep_alive:
+                self.request.settimeout(30)
+                while self.request.recv(4096):
+                    pass
+        except (socket.timeout, socket.error):
+            pass
+
+
+class ThreadingOrigin(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def wait_for_listener(process, port, timeout=30):
+    """Attend qu'un port soit en écoute dans ce processus (sans s'y connecter)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for conn in process.net_connections(kind='tcp'):
+            if conn.status == psutil.CONN_LISTEN and conn.laddr.port == port:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"Le port {port} n'est pas en écoute.")
+
+
+def start_environment(process):
+    """Démarre le serveur web local et les deux proxies dans ce processus."""
+    origin = ThreadingOrigin(('127.0.0.1', 0), OriginHandler)
+    threading.Thread(target=origin.serve_forever, daemon=True).start()
+
+    threading.Thread(target=server_proxy.start_proxy, daemon=True).start()
+    wait_for_listener(process, DESTINATION_PROXY_PORT)
+    threading.Thread(target=client_proxy.start_proxy, daemon=True).start()
+    wait_for_listener(process, SOURCE_PROXY_PORT)
+
+    return origin
+
+
+class LoadGenerator:
+    """Envoie des requêtes à débit constant à travers le proxy source.
+
+    Un client supplémentaire envoie en continu des requêtes vers STALLED_PATHS ; leur
+    échec est attendu et n'est pas compté dans le taux d'erreur.
+    """
+
+    def __init__(self, base_url, workers, rate):
+        self.base_url = base_url
+        self.workers = workers
+        self.interval = workers / rate
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.ok = 0
+        self.errors = 0
+        self.stalled = 0
+        self.threads = []
+
+    def start(self):
+        targets = [(self.run, (i,)) for i in range(self.workers)] + [(self.run_stalled, ())]
+        for target, args in targets:
+            thread = threading.Thread(target=target, args=args, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def error_rate(self):
+        with self.lock:
+            total = self.ok + self.errors
+            return self.errors / total if total else 0.0
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=SOURCE_FIRST_RECORD_TIMEOUT + 5)
+
+    def run(self, worker_index):
+        paths = [path for path in ORIGIN_PAGES if path not in STALLED_PATHS]
+        count = worker_index
+        next_time = time.monotonic()
+        while not self.stop_event.is_set():
+            path = paths[count % len(paths)]
+            count += 1
+            try:
+                response = requests.get(self.base_url + path, proxies=PROXY, timeout=10)
+                success = response.content == ORIGIN_PAGES[path][1]
+            except Exception:
+                success = False
+            with self.lock:
+                if success:
+                    self.ok += 1
+                else:
+                    self.errors += 1
+
+            next_time += self.interval
+            self.stop_event.wait(max(next_time - time.monotonic(), 0))
+
+    def run_stalled(self):
+        paths = sorted(STALLED_PATHS)
+        count = 0
+        while not self.stop_event.is_set():
+            try:
+                requests.get(self.base_url + paths[count % len(paths)], proxies=PROXY,
+                             timeout=SOURCE_FIRST_RECORD_TIMEOUT + 5)
+            except Exception:
+                pass
+            count += 1
+            with self.lock:
+                self.stalled += 1
+
+
+def take_sample(process):
+    """Mesure l'état du processus après un passage du ramasse-miettes."""
+    gc.collect()
+    if hasattr(process, 'num_fds'):
+        open_fds = process.num_fds()
+    else:
+        open_fds = process.num_handles()
+    return {
+        'time': time.monotonic(),
+        'threads': threading.active_count(),
+        'fds': open_fds,
+        'rss_mb': process.memory_info().rss / (1024 * 1024),
+        'traced_mb': tracemalloc.get_traced_memory()[0] / (1024 * 1024),
+        'snapshot': tracemalloc.take_snapshot(),
+    }
+
+
+def check_growth(baseline, sample, load):
+    """Retourne la liste des seuils dépassés entre la référence et la mesure courante."""
+    violations = []
+    if load.ok == 0:
+        violations.append("aucune requête réussie")
+    elif load.error_rate() > MAX_ERROR_RATE:
+        violations.append(f"taux d'échec : {load.error_rate():.2%} ({load.errors} requêtes)")
+    if sample['threads'] - baseline['threads'] > MAX_THREAD_GROWTH:
+        violations.append(f"threads : {baseline['threads']} -> {sample['threads']}")
+    if sample['fds'] - baseline['fds'] > MAX_FD_GROWTH:
+        violations.append(f"descripteurs : {baseline['fds']} -> {sample['fds']}")
+    if sample['rss_mb'] - baseline['rss_mb'] > MAX_RSS_GROWTH_MB:
+        violations.append(f"RSS : {baseline['rss_mb']:.1f} Mo -> {sample['rss_mb']:.1f} Mo")
+    if sample['traced_mb'] - baseline['traced_mb'] > MAX_TRACED_GROWTH_MB:
+        violations.append(f"tracemalloc : {baseline['traced_mb']:.1f} Mo -> {sample['traced_mb']:.1f} Mo")
+    return violations
+
+
+def report_top_allocations(baseline, sample, limit=10):
+    """Affiche les lignes de code dont l'allocation a le plus augmenté."""
+    report(f"\n  Principales croissances d'allocation (top {limit}) :")
+    for stat in sample['snapshot'].compare_to(baseline['snapshot'], 'lineno')[:limit]:
+        report(f"    {stat}")
+
+
+def run_soak_test(hours, workers, rate, interval, warmup=WARMUP_SECONDS, prefetch=False):
+    """Exécute le test d'endurance ; retourne True si aucun seuil n'a été dépassé."""
+    if hours * 3600 < warmup + interval:
+        raise ValueError("La durée doit couvrir l'échauffement et au moins une mesure.")
+
+    report("\n" + "="*60)
+    report(" TEST D'ENDURANCE DES PROXIES")
+    report("="*60)
+    report(f"  Durée : {hours} h, {workers} clients, {rate} requêtes/s, mesure toutes les {interval} s")
+    report(f"  Préchargement : {'activé' if prefetch else 'désactivé'}")
+
+    server_proxy.PREFETCH_ENABLED = prefetch
+
+    tracemalloc.start(25)
+    process = psutil.Process()
+
+    origin = start_environment(process)
+    base_url = f"http://127.0.0.1:{origin.server_address[1]}"
+    load = LoadGenerator(base_url, workers, rate)
+    load.start()
+
+    end_time = time.monotonic() + hours * 3600
+    time.sleep(warmup)
+    baseline = take_sample(process)
+    report(f"\n  Référence : {baseline['threads']} threads, {baseline['fds']} descripteurs, "
+           f"RSS {baseline['rss_mb']:.1f} Mo, tracemalloc {baseline['traced_mb']:.1f} Mo")
+
+    sample = baseline
+    violations = []
+    while time.monotonic() < end_time:
+        time.sleep(min(interval, max(end_time - time.monotonic(), 0)))
+        sample = take_sample(process)
+        elapsed_min = (sample['time'] - baseline['time']) / 60
+        report(f"  [{elapsed_min:7.1f} min] threads {sample['threads']:4d} | descripteurs {sample['fds']:4d} | "
+               f"RSS {sample['rss_mb']:7.1f} Mo | tracemalloc {sample['traced_mb']:7.1f} Mo | "
+               f"requêtes {load.ok} OK / {load.errors} échecs / {load.stalled} bloquées")
+        violations = check_growth(baseline, sample, load)
+        if violations:
+            break
+
+    load.stop()
+    origin.shutdown()
+
+    report("\n" + "="*60)
+    report(" RÉSULTATS")
+    report("="*60)
+    report(f"  Requêtes : {load.ok} OK, {load.errors} échecs ({load.error_rate():.2%}), "
+           f"{load.stalled} bloquées (échec attendu)")
+    if server_proxy.PREFETCH_ENGINE:
+        report(f"  Préchargement : {server_proxy.PREFETCH_ENGINE.format_stats()}")
+    report_top_allocations(baseline, sample)
+
+    if violations:
+        report("\n  ÉCHEC : seuils dépassés")
+        for violation in violations:
+            report(f"    - {violation}")
+        return False
+
+    report("\n  Aucune fuite détectée.")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test d'endurance des proxies")
+    parser.add_argument('--hours', type=float, default=4, help="Durée du test en heures")
+    parser.add_argument('--workers', type=int, default=4, help="Nombre de clients simultanés")
+    parser.add_argument('--rate', type=float, default=20, help="Requêtes par seconde (total)")
+    parser.add_argument('--interval', type=float, default=60, help="Intervalle entre deux mesures (s)")
+    parser.add_argument('--warmup', type=float, default=WARMUP_SECONDS, help="Durée de l'échauffement (s)")
+    parser.add_argument('--prefetch', action='store_true', help="Activer le préchargement sur le Proxy de Sortie")
+    parser.add_argument('--verbose', action='store_true', help="Conserver les logs des proxies")
+    args = parser.parse_args()
+
+    if args.hours * 3600 < args.warmup + args.interval:
+        parser.error("--hours doit couvrir --warmup et au moins un --interval")
+
+    if not args.verbose:
+        sys.stdout = open(os.devnull, 'w')
+
+    success = run_soak_test(args.hours, args.workers, args.rate, args.interval, args.warmup, args.prefetch)
+    sys.exit(0 if success else 1)
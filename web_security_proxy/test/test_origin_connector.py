@@ -0,0 +1,141 @@
+"""
+Tests hors ligne de la connexion « happy eyeballs » aux serveurs web
+Exécution : python -m pytest web_security_proxy/test/test_origin_connector.py
+"""
+
+import errno
+import os
+import socket
+import time
+
+import pytest
+
+from web_security_proxy.config.settings import ORIGIN_CONNECT_STAGGER
+from web_security_proxy.proxy_destination import origin_connector
+
+
+@pytest.fixture(autouse=True)
+def clear_failed_addresses():
+    origin_connector.FAILED_ADDRESSES.clear()
+    yield
+    origin_connector.FAILED_ADDRESSES.clear()
+
+
+@pytest.fixture
+def live_listener():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(5)
+    yield server.getsockname()
+    server.close()
+
+
+@pytest.fixture
+def dead_listener():
+    """Serveur dont la file d'attente est pleine : les SYN suivants restent sans réponse."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(0)
+    fillers = []
+    for _ in range(3):
+        filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        filler.setblocking(False)
+        filler.connect_ex(server.getsockname())
+        fillers.append(filler)
+    time.sleep(0.2)
+    yield server.getsockname()
+    for filler in fillers:
+        filler.close()
+    server.close()
+
+
+# connect_ex échoue immédiatement (EACCES/ENETUNREACH) sans passer par le sélecteur
+UNREACHABLE_ADDRESS = ("255.255.255.255", 80)
+
+
+def use_addresses(monkeypatch, *sockaddrs):
+    monkeypatch.setattr(
+        origin_connector, "resolve_addresses",
+        lambda host, port, deadline=None: [(socket.AF_INET, addr) for addr in sockaddrs]
+    )
+
+
+def test_stalled_address_loses_race_after_stagger(monkeypatch, dead_listener, live_listener):
+    use_addresses(monkeypatch, dead_listener, live_listener)
+    start = time.monotonic()
+    sock = origin_connector.connect_to_origin("origin", 80)
+    elapsed = time.monotonic() - start
+    try:
+        assert sock.getpeername() == live_listener
+        assert ORIGIN_CONNECT_STAGGER * 0.9 <= elapsed < ORIGIN_CONNECT_STAGGER + 0.2
+    finally:
+        sock.close()
+
+
+def test_immediate_failure_starts_next_attempt_without_waiting(monkeypatch, dead_listener, live_listener):
+    use_addresses(monkeypatch, dead_listener, UNREACHABLE_ADDRESS, live_listener)
+    start = time.monotonic()
+    sock = origin_connector.connect_to_origin("origin", 80)
+    elapsed = time.monotonic() - start
+    try:
+        assert sock.getpeername() == live_listener
+        assert elapsed < 2 * ORIGIN_CONNECT_STAGGER * 0.9
+        assert origin_connector.is_address_failed(UNREACHABLE_ADDRESS)
+    finally:
+        sock.close()
+
+
+def test_deadline_raises_timeout_and_remembers_address(monkeypatch, dead_listener):
+    use_addresses(monkeypatch, dead_listener)
+    start = time.monotonic()
+    with pytest.raises(socket.timeout):
+        origin_connector.connect_to_origin("origin", 80, time.monotonic() + 0.5)
+    assert time.monotonic() - start < 0.7
+    assert origin_connector.is_address_failed(dead_listener)
+
+
+def test_stalled_resolver_respects_deadline(monkeypatch):
+    monkeypatch.setattr(origin_connector.socket, "getaddrinfo", lambda *args, **kwargs: time.sleep(2))
+    start = time.monotonic()
+    with pytest.raises(socket.timeout):
+        origin_connector.connect_to_origin("origin", 80, time.monotonic() + 0.3)
+    assert time.monotonic() - start < 0.5
+
+
+def test_failed_addresses_are_demoted_then_pruned(monkeypatch):
+    infos = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", 80)),
+             (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.2", 80))]
+    monkeypatch.setattr(origin_connector.socket, "getaddrinfo", lambda *args, **kwargs: infos)
+    origin_connector.mark_address_failed(("10.0.0.1", 80))
+    assert [addr for _, addr in origin_connector.resolve_addresses("origin", 80)] == [
+        ("10.0.0.2", 80), ("10.0.0.1", 80)]
+
+    origin_connector.FAILED_ADDRESSES[("10.0.0.1", 80)] = time.monotonic() - 1
+    origin_connector.mark_address_failed(("10.0.0.3", 80))
+    assert list(origin_connector.FAILED_ADDRESSES) == [("10.0.0.3", 80)]
+
+
+def unsupported_family_socket(family):
+    """Fabrique de sockets qui refuse `family`, comme un hôte sans support IPv6."""
+    real_socket = socket.socket
+
+    def create(sock_family=socket.AF_INET, *args, **kwargs):
+        if sock_family == family:
+            raise OSError(errno.EAFNOSUPPORT, os.strerror(errno.EAFNOSUPPORT))
+        return real_socket(sock_family, *args, **kwargs)
+    return create
+
+
+def test_unsupported_family_is_skipped(monkeypatch, live_listener):
+    unsupported = (socket.AF_INET6, ("::1", 80, 0, 0))
+    monkeypatch.setattr(origin_connector.socket, "socket", unsupported_family_socket(socket.AF_INET6))
+    monkeypatch.setattr(
+        origin_connector, "resolve_addresses",
+        lambda host, port, deadline=None: [unsupported, (socket.AF_INET, live_listener)]
+    )
+    sock = origin_connector.connect_to_origin("origin", 80)
+    try:
+        assert sock.getpeername() == live_listener
+        assert origin_connector.is_address_failed(unsupported[1])
+    finally:
+        sock.close()
@@ -0,0 +1,125 @@
+"""
+Tests hors ligne du moteur de préchargement (analyse HTML, même origine, cache)
+Exécution : python -m pytest web_security_proxy/test/test_prefetch.py
+"""
+
+import time
+
+from web_security_proxy.proxy_destination.prefetch import (
+    HtmlScanner, PrefetchCache, PrefetchEngine, is_cacheable_response
+)
+
+HTML_HEADERS = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n"
+
+
+class RecordingEngine:
+    """Remplace PrefetchEngine pour HtmlScanner : enregistre les URL planifiées."""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def count(self, name, amount=1):
+        pass
+
+    def schedule(self, base_url, url, depth, forwarded_headers):
+        self.scheduled.append(url)
+
+
+class RecordingExecutor:
+    """Remplace le pool de PrefetchEngine : enregistre les clés au lieu de télécharger."""
+
+    def __init__(self):
+        self.keys = []
+
+    def submit(self, fn, key, *args):
+        self.keys.append(key)
+
+
+def new_stats():
+    return {'hits': 0, 'hit_bytes': 0, 'misses': 0, 'wasted': 0, 'wasted_bytes': 0}
+
+
+def test_scanner_finds_tag_split_across_chunks():
+    engine = RecordingEngine()
+    scanner = HtmlScanner(engine, "example.com", 80, "/index.html", {})
+    scanner.feed(HTML_HEADERS + b'<html><link rel="stylesheet" href="a.css"><scr')
+    scanner.feed(b"ipt src='/app.js'></script><img src=logo.png><link rel=icon href=f.ico>")
+    assert engine.scheduled == ["a.css", "/app.js", "logo.png"]
+
+
+def test_scanner_ignores_non_html_and_encoded_responses():
+    engine = RecordingEngine()
+    HtmlScanner(engine, "example.com", 80, "/", {}).feed(
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/css\r\n\r\n<img src=a.png>")
+    HtmlScanner(engine, "example.com", 80, "/", {}).feed(
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Encoding: gzip\r\n\r\n<img src=a.png>")
+    HtmlScanner(engine, "example.com", 80, "/", {}).feed(
+        b"HTTP/1.1 404 Not Found\r\nContent-Type: text/html\r\n\r\n<img src=a.png>")
+    assert engine.scheduled == []
+
+
+def test_engine_schedules_same_origin_only():
+    engine = PrefetchEngine()
+    engine.executor.shutdown()
+    engine.executor = RecordingExecutor()
+    base_url = "http://example.com:80/dir/page.html"
+    for url in ("style.css", "/img/a.png?v=2", "http://example.com/b.js",
+                "http://other.com/c.js", "https://example.com/d.js",
+                "http://example.com:8080/e.js", "//cdn.example.com/f.js"):
+        engine.schedule(base_url, url, 1, {})
+    engine.schedule(base_url, "style.css", 1, {})
+    assert engine.executor.keys == [
+        ("example.com", 80, "/dir/style.css"),
+        ("example.com", 80, "/img/a.png?v=2"),
+        ("example.com", 80, "/b.js"),
+    ]
+
+
+def test_cache_entries_are_single_use():
+    stats = new_stats()
+    cache = PrefetchCache(1024, 30, stats)
+    cache.put(("h", 80, "/a"), b"data")
+    assert cache.take(("h", 80, "/a")) == b"data"
+    assert cache.take(("h", 80, "/a")) is None
+    assert stats['hits'] == 1
+
+
+def test_engine_counts_misses_only_for_prefetches_in_flight():
+    engine = PrefetchEngine()
+    engine.executor.shutdown()
+    engine.executor = RecordingExecutor()
+    assert engine.lookup("example.com", 80, "/ordinary.js") is None
+    engine.schedule("http://example.com:80/", "/pending.js", 1, {})
+    assert engine.lookup("example.com", 80, "http://example.com/pending.js") is None
+    assert engine.stats['misses'] == 1
+
+
+def test_cache_expired_entries_are_counted_as_wasted_on_take():
+    stats = new_stats()
+    cache = PrefetchCache(1024, 0.05, stats)
+    cache.put(("h", 80, "/a"), b"data")
+    time.sleep(0.1)
+    assert cache.take(("h", 80, "/other")) is None
+    assert (stats['wasted'], stats['wasted_bytes']) == (1, 4)
+    assert cache.total_bytes == 0
+
+
+def test_cache_evicts_oldest_when_over_budget():
+    stats = new_stats()
+    cache = PrefetchCache(10, 30, stats)
+    cache.put(("h", 80, "/a"), b"123456")
+    cache.put(("h", 80, "/b"), b"abcdef")
+    assert not cache.contains(("h", 80, "/a"))
+    assert cache.take(("h", 80, "/b")) == b"abcdef"
+    assert (stats['wasted'], stats['wasted_bytes']) == (1, 6)
+    assert not cache.put(("h", 80, "/c"), b"x" * 11)
+
+
+def test_uncacheable_responses_are_rejected():
+    assert is_cacheable_response({})
+    assert is_cacheable_response({'cache-control': 'max-age=60', 'vary': 'Accept-Encoding'})
+    assert not is_cacheable_response({'cache-control': 'no-store'})
+    assert not is_cacheable_response({'cache-control': 'max-age=60, private'})
+    assert not is_cacheable_response({'vary': 'Accept-Encoding, Cookie'})
+    assert not is_cacheable_response({'vary': '*'})
+    assert not is_cacheable_response({'set-cookie': 'session=abc; Path=/'})
@@ -0,0 +1,92 @@
+"""
+Tests hors ligne du framing des enregistrements et du pipeline de chiffrement ordonné
+Exécution : python -m pytest web_security_proxy/test/test_record_channel.py
+"""
+
+import os
+import socket
+import threading
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from web_security_proxy.record_channel import OrderedCryptoPipeline, send_record, recv_record
+from web_security_proxy.proxy_destination.crypto_server import encrypt_data
+from web_security_proxy.proxy_source.crypto_client import decrypt_data
+
+
+def test_records_round_trip_with_pending_bytes():
+    left, right = socket.socketpair()
+    try:
+        send_record(left, b"a" * 70000)
+        send_record(left, b"second")
+        left.close()
+        prefix = right.recv(3)
+        assert recv_record(right, prefix) == b"a" * 70000
+        assert recv_record(right) == b"second"
+        assert recv_record(right) is None
+    finally:
+        right.close()
+
+
+def test_oversized_record_is_rejected():
+    left, right = socket.socketpair()
+    try:
+        left.sendall(b"\xff\xff\xff\xff")
+        with pytest.raises(ValueError):
+            recv_record(right)
+    finally:
+        left.close()
+        right.close()
+
+
+@pytest.mark.parametrize("workers", [0, 1, 4])
+def test_pipeline_preserves_order_and_bounds_window(workers):
+    session_key = os.urandom(32)
+    records = [os.urandom(1000 + i) for i in range(50)]
+    encrypted = []
+    max_pending = []
+
+    encryptor = OrderedCryptoPipeline(encrypt_data, session_key, encrypted.append, workers=workers, window=3)
+    try:
+        for record in records:
+            encryptor.submit(record)
+            max_pending.append(len(encryptor.pending))
+        encryptor.flush()
+    finally:
+        encryptor.close()
+
+    decrypted = []
+    decryptor = OrderedCryptoPipeline(decrypt_data, session_key, decrypted.append, workers=workers, window=3)
+    try:
+        for record in encrypted:
+            decryptor.submit(record)
+        decryptor.flush()
+    finally:
+        decryptor.close()
+
+    assert decrypted == records
+    assert max(max_pending) <= 3
+
+
+def test_pipeline_sends_finished_record_without_flush():
+    session_key = os.urandom(32)
+    sent = threading.Event()
+    encryptor = OrderedCryptoPipeline(encrypt_data, session_key, lambda record: sent.set(), workers=2, window=8)
+    try:
+        encryptor.submit(b"dernier enregistrement d'une connexion keep-alive")
+        assert sent.wait(1)
+        assert not encryptor.pending
+    finally:
+        encryptor.close()
+
+
+def test_pipeline_reports_crypto_error_on_flush():
+    session_key = os.urandom(32)
+    decryptor = OrderedCryptoPipeline(decrypt_data, session_key, lambda record: None, workers=2)
+    try:
+        decryptor.submit(os.urandom(64))
+        with pytest.raises(InvalidTag):
+            decryptor.flush()
+    finally:
+        decryptor.close()